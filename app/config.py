@@ -1,6 +1,9 @@
 """
 Configuration management for the Unit Converter API
 """
+import os
+
+from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
@@ -16,13 +19,54 @@ class Settings(BaseSettings):
     # Server Configuration
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    ENVIRONMENT: str = "production"
     
     # Logging
     LOG_LEVEL: str = "INFO"
     
+    # Tracing: "none", "otlp" (gRPC to OTEL_ENDPOINT) or "console" (development
+    # only); empty selects otlp when a collector endpoint is configured
+    OTEL_EXPORTER: str = ""
+    OTEL_ENDPOINT: str = ""
+    # Plaintext gRPC to the collector; when off the SDK decides from
+    # OTEL_EXPORTER_OTLP_INSECURE and the endpoint scheme (TLS by default)
+    OTEL_INSECURE: bool = False
+    
+    # Span batching, tuned for bursts of small REST spans
+    OTEL_BSP_MAX_QUEUE_SIZE: int = 4096
+    OTEL_BSP_SCHEDULE_DELAY: int = 1000
+    OTEL_BSP_MAX_EXPORT_BATCH_SIZE: int = 256
+    OTEL_BSP_EXPORT_TIMEOUT: int = 10000
+    
+    # How often buffered request metrics are applied (0 disables the periodic
+    # flush; /metrics and full buffers still flush)
+    METRICS_FLUSH_SECONDS: float = 0.5
+    
+    # Largest accepted batch (values per /convert/*/batch request). The request
+    # body is parsed on the event loop, about 3 ms per 10k values
+    BATCH_MAX_SIZE: int = 10_000
+    
     # External API
     CURRENCY_API_URL: str = "https://api.exchangerate-api.com/v4/latest"
     CURRENCY_API_TIMEOUT: int = 5
+    CURRENCY_CACHE_TTL_SECONDS: int = 600
+    CURRENCY_CACHE_MAXSIZE: int = 512
+    
+    # Rates cache saved here on shutdown and reloaded on startup ("" disables);
+    # a leading ~ is expanded to the user's home directory
+    CURRENCY_CACHE_FILE: str = Field(
+        "~/.cache/unit_converter/rates.json", validate_default=True
+    )
+    
+    # Base currencies kept warm by a background refresh (0 disables it);
+    # the interval should stay below the cache TTL
+    CURRENCY_BASES: list[str] = ["USD", "EUR", "GBP", "TND"]
+    CURRENCY_REFRESH_SECONDS: int = 300
+    
+    @field_validator("CURRENCY_CACHE_FILE")
+    @classmethod
+    def expand_home(cls, value: str) -> str:
+        return os.path.expanduser(value)
     
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -1,8 +1,15 @@
 """
 Unit conversion logic for length, weight, temperature, and currency
 """
-import requests
-from typing import Dict, Optional
+import json
+import os
+import tempfile
+import time
+import httpx
+import numpy as np
+from functools import lru_cache
+from cachetools import TLRUCache
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
 from app.config import settings
 
 
@@ -27,8 +34,124 @@ WEIGHT_FACTORS: Dict[str, float] = {
     "ton": 1000.0,
 }
 
-# In-memory cache for currency rates
-_CURRENCY_CACHE: Dict[str, float] = {}
+# Direct conversion factors for every (from, to) pair, so a conversion is a
+# single lookup and multiply instead of going through the base unit
+_LENGTH_CROSS: Dict[Tuple[str, str], float] = {
+    (a, b): fa / fb
+    for a, fa in LENGTH_FACTORS.items()
+    for b, fb in LENGTH_FACTORS.items()
+}
+
+_WEIGHT_CROSS: Dict[Tuple[str, str], float] = {
+    (a, b): fa / fb
+    for a, fa in WEIGHT_FACTORS.items()
+    for b, fb in WEIGHT_FACTORS.items()
+}
+
+TEMPERATURE_UNITS: Tuple[str, ...] = ("celsius", "fahrenheit", "kelvin")
+
+# Affine coefficients (a, b) for every (from, to) pair: result = value * a + b
+_TEMP_AFFINE: Dict[Tuple[str, str], Tuple[float, float]] = {
+    ("celsius", "celsius"): (1.0, 0.0),
+    ("celsius", "fahrenheit"): (9/5, 32.0),
+    ("celsius", "kelvin"): (1.0, 273.15),
+    ("fahrenheit", "celsius"): (5/9, -32 * 5/9),
+    ("fahrenheit", "fahrenheit"): (1.0, 0.0),
+    ("fahrenheit", "kelvin"): (5/9, -32 * 5/9 + 273.15),
+    ("kelvin", "celsius"): (1.0, -273.15),
+    ("kelvin", "fahrenheit"): (9/5, -273.15 * 9/5 + 32.0),
+    ("kelvin", "kelvin"): (1.0, 0.0),
+}
+
+# "Supported: ..." lists for error messages, built once
+_LENGTH_UNITS_STR = ", ".join(LENGTH_FACTORS)
+_WEIGHT_UNITS_STR = ", ".join(WEIGHT_FACTORS)
+_TEMP_UNITS_STR = ", ".join(TEMPERATURE_UNITS)
+
+class _RatesTable(dict):
+    """Rates for one base currency, stamped with the time they were fetched"""
+    __slots__ = ("fetched_at",)
+
+    def __init__(self, rates: Dict[str, float], fetched_at: float):
+        super().__init__(rates)
+        self.fetched_at = fetched_at
+
+
+def _rates_expiry(base: str, rates: Dict[str, float], now: float) -> float:
+    return getattr(rates, "fetched_at", now) + settings.CURRENCY_CACHE_TTL_SECONDS
+
+
+def _make_rates_cache(maxsize: int, timer=time.time) -> TLRUCache:
+    return TLRUCache(maxsize=maxsize, ttu=_rates_expiry, timer=timer)
+
+
+# In-memory cache of the full rates table per base currency; each entry
+# expires a TTL after it was fetched so rates never go stale, and once full
+# the least recently used base is evicted. Expiry runs on the wall clock so
+# it stays correct for entries reloaded from disk after a restart. No lock is
+# needed: the cache is only touched from the event loop thread.
+_RATES_CACHE: TLRUCache = _make_rates_cache(settings.CURRENCY_CACHE_MAXSIZE)
+
+
+def _unit_error(
+    from_unit: str,
+    to_unit: str,
+    units: Collection[str],
+    supported: str
+) -> ValueError:
+    """Build the ValueError for a unit pair that failed a table lookup"""
+    if from_unit not in units:
+        return ValueError(
+            f"Invalid source unit '{from_unit}'. Supported: {supported}"
+        )
+    return ValueError(
+        f"Invalid target unit '{to_unit}'. Supported: {supported}"
+    )
+
+
+def _lookup_normalized(
+    table: Dict,
+    units: Collection[str],
+    supported: str,
+    from_unit: str,
+    to_unit: str
+):
+    """
+    Slow path for a table lookup that missed on the exact spelling
+    
+    Callers first try the units as given (request models already lowercase
+    them); only on a miss are they lowercased here and looked up again.
+    """
+    from_unit = from_unit.lower()
+    to_unit = to_unit.lower()
+    try:
+        return table[(from_unit, to_unit)]
+    except KeyError:
+        raise _unit_error(from_unit, to_unit, units, supported) from None
+
+
+# Memoized slow-path resolvers: a repeated non-canonical spelling such as
+# ("METER", "Foot") resolves with one cache hit instead of re-lowercasing.
+# Invalid units raise, so they are never cached.
+@lru_cache(maxsize=512)
+def _length_factor(from_unit: str, to_unit: str) -> float:
+    return _lookup_normalized(
+        _LENGTH_CROSS, LENGTH_FACTORS, _LENGTH_UNITS_STR, from_unit, to_unit
+    )
+
+
+@lru_cache(maxsize=512)
+def _weight_factor(from_unit: str, to_unit: str) -> float:
+    return _lookup_normalized(
+        _WEIGHT_CROSS, WEIGHT_FACTORS, _WEIGHT_UNITS_STR, from_unit, to_unit
+    )
+
+
+@lru_cache(maxsize=512)
+def _temperature_affine(from_unit: str, to_unit: str) -> Tuple[float, float]:
+    return _lookup_normalized(
+        _TEMP_AFFINE, TEMPERATURE_UNITS, _TEMP_UNITS_STR, from_unit, to_unit
+    )
 
 
 def convert_length(value: float, from_unit: str, to_unit: str) -> float:
@@ -52,26 +175,12 @@ def convert_length(value: float, from_unit: str, to_unit: str) -> float:
         >>> convert_length(1, "foot", "meter")
         0.3048
     """
-    from_unit = from_unit.lower()
-    to_unit = to_unit.lower()
-    
-    if from_unit not in LENGTH_FACTORS:
-        raise ValueError(
-            f"Invalid source unit '{from_unit}'. "
-            f"Supported: {', '.join(LENGTH_FACTORS.keys())}"
-        )
-    
-    if to_unit not in LENGTH_FACTORS:
-        raise ValueError(
-            f"Invalid target unit '{to_unit}'. "
-            f"Supported: {', '.join(LENGTH_FACTORS.keys())}"
-        )
-    
-    # Convert to base unit (meters), then to target unit
-    meters = value * LENGTH_FACTORS[from_unit]
-    result = meters / LENGTH_FACTORS[to_unit]
+    try:
+        factor = _LENGTH_CROSS[(from_unit, to_unit)]
+    except KeyError:
+        factor = _length_factor(from_unit, to_unit)
     
-    return round(result, 6)
+    return round(value * factor, 6)
 
 
 def convert_weight(value: float, from_unit: str, to_unit: str) -> float:
@@ -95,26 +204,12 @@ def convert_weight(value: float, from_unit: str, to_unit: str) -> float:
         >>> convert_weight(1, "pound", "kilogram")
         0.453592
     """
-    from_unit = from_unit.lower()
-    to_unit = to_unit.lower()
-    
-    if from_unit not in WEIGHT_FACTORS:
-        raise ValueError(
-            f"Invalid source unit '{from_unit}'. "
-            f"Supported: {', '.join(WEIGHT_FACTORS.keys())}"
-        )
-    
-    if to_unit not in WEIGHT_FACTORS:
-        raise ValueError(
-            f"Invalid target unit '{to_unit}'. "
-            f"Supported: {', '.join(WEIGHT_FACTORS.keys())}"
-        )
-    
-    # Convert to base unit (kilograms), then to target unit
-    kilograms = value * WEIGHT_FACTORS[from_unit]
-    result = kilograms / WEIGHT_FACTORS[to_unit]
+    try:
+        factor = _WEIGHT_CROSS[(from_unit, to_unit)]
+    except KeyError:
+        factor = _weight_factor(from_unit, to_unit)
     
-    return round(result, 6)
+    return round(value * factor, 6)
 
 
 def convert_temperature(value: float, from_unit: str, to_unit: str) -> float:
@@ -138,50 +233,137 @@ def convert_temperature(value: float, from_unit: str, to_unit: str) -> float:
         >>> convert_temperature(273.15, "kelvin", "celsius")
         0.0
     """
-    from_unit = from_unit.lower()
-    to_unit = to_unit.lower()
+    try:
+        a, b = _TEMP_AFFINE[(from_unit, to_unit)]
+    except KeyError:
+        a, b = _temperature_affine(from_unit, to_unit)
     
-    valid_units = {"celsius", "fahrenheit", "kelvin"}
+    return round(value * a + b, 2)
+
+
+# Below this many values a plain loop beats NumPy's array round trip
+# (asarray + ufuncs + tolist cost a few microseconds regardless of size)
+NUMPY_MIN_BATCH = 12
+
+
+def _round_like_python(values: np.ndarray, decimals: int) -> np.ndarray:
+    """
+    Round an array exactly as Python's round() rounds each element
     
-    if from_unit not in valid_units:
-        raise ValueError(
-            f"Invalid source unit '{from_unit}'. "
-            f"Supported: {', '.join(valid_units)}"
-        )
+    np.round scales by 10**decimals and rounds half to even on the scaled
+    value, which differs from round() only where that product lands within
+    its rounding error of a half-way point. Those few elements (and
+    non-finite ones) are rounded by round() itself; every other element's
+    np.rint result is already the one round() gives.
+    """
+    scale = 10.0 ** decimals
+    with np.errstate(over="ignore", invalid="ignore"):
+        scaled = values * scale
+        rounded = np.rint(scaled) / scale
+        distance_to_half = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5)
+        # Written as "not clearly away" so NaN and inf are picked up too
+        near_half = ~(distance_to_half > 1e-9 * np.maximum(np.abs(scaled), 1.0))
+    for i in np.flatnonzero(near_half).tolist():
+        rounded[i] = round(float(values[i]), decimals)
+    return rounded
+
+
+def _affine_batch(
+    values: Sequence[float],
+    a: float,
+    b: float,
+    decimals: int
+) -> List[float]:
+    """Compute round(values * a + b) with a Python loop or NumPy by batch size"""
+    if len(values) < NUMPY_MIN_BATCH:
+        return [round(v * a + b, decimals) for v in values]
+    out = np.asarray(values, dtype=np.float64) * a + b
+    return _round_like_python(out, decimals).tolist()
+
+
+def convert_length_batch(
+    values: Sequence[float],
+    from_unit: str,
+    to_unit: str
+) -> List[float]:
+    """
+    Convert a batch of lengths
     
-    if to_unit not in valid_units:
-        raise ValueError(
-            f"Invalid target unit '{to_unit}'. "
-            f"Supported: {', '.join(valid_units)}"
-        )
+    Batches of NUMPY_MIN_BATCH values or more are computed with NumPy, and
+    every batch size gives exactly the results of convert_length (same units,
+    round() to 6 decimals).
     
-    # Same unit, no conversion needed
-    if from_unit == to_unit:
-        return round(value, 2)
+    Raises:
+        ValueError: If units are not supported
+    
+    Example:
+        >>> convert_length_batch([1000, 2500], "meter", "kilometer")
+        [1.0, 2.5]
+    """
+    try:
+        factor = _LENGTH_CROSS[(from_unit, to_unit)]
+    except KeyError:
+        factor = _length_factor(from_unit, to_unit)
+    
+    return _affine_batch(values, factor, 0.0, 6)
+
+
+def convert_weight_batch(
+    values: Sequence[float],
+    from_unit: str,
+    to_unit: str
+) -> List[float]:
+    """
+    Convert a batch of weights
     
-    # Conversion logic
-    if from_unit == "celsius":
-        if to_unit == "fahrenheit":
-            result = (value * 9/5) + 32
-        else:  # to kelvin
-            result = value + 273.15
+    Batches of NUMPY_MIN_BATCH values or more are computed with NumPy, and
+    every batch size gives exactly the results of convert_weight (same units,
+    round() to 6 decimals).
     
-    elif from_unit == "fahrenheit":
-        if to_unit == "celsius":
-            result = (value - 32) * 5/9
-        else:  # to kelvin
-            result = (value - 32) * 5/9 + 273.15
+    Raises:
+        ValueError: If units are not supported
     
-    else:  # from kelvin
-        if to_unit == "celsius":
-            result = value - 273.15
-        else:  # to fahrenheit
-            result = (value - 273.15) * 9/5 + 32
+    Example:
+        >>> convert_weight_batch([1, 2], "kilogram", "gram")
+        [1000.0, 2000.0]
+    """
+    try:
+        factor = _WEIGHT_CROSS[(from_unit, to_unit)]
+    except KeyError:
+        factor = _weight_factor(from_unit, to_unit)
     
-    return round(result, 2)
+    return _affine_batch(values, factor, 0.0, 6)
 
 
-def get_currency_rate(
+def convert_temperature_batch(
+    values: Sequence[float],
+    from_unit: str,
+    to_unit: str
+) -> List[float]:
+    """
+    Convert a batch of temperatures
+    
+    Batches of NUMPY_MIN_BATCH values or more are computed with NumPy, and
+    every batch size gives exactly the results of convert_temperature (same units,
+    round() to 2 decimals).
+    
+    Raises:
+        ValueError: If units are not supported
+    
+    Example:
+        >>> convert_temperature_batch([0, 100], "celsius", "fahrenheit")
+        [32.0, 212.0]
+    """
+    try:
+        a, b = _TEMP_AFFINE[(from_unit, to_unit)]
+    except KeyError:
+        a, b = _temperature_affine(from_unit, to_unit)
+    
+    return _affine_batch(values, a, b, 2)
+
+
+async def get_currency_rate(
+    client: httpx.AsyncClient,
     value: float, 
     from_currency: str, 
     to_currency: str
@@ -190,6 +372,7 @@ def get_currency_rate(
     Convert currency using live exchange rates
     
     Args:
+        client: Pooled HTTP client whose base URL is the currency API
         value: Amount to convert
         from_currency: Source currency code (e.g., 'USD', 'EUR')
         to_currency: Target currency code (e.g., 'TND', 'GBP')
@@ -201,21 +384,149 @@ def get_currency_rate(
         Exception: If API call fails or currency not found
     
     Example:
-        >>> get_currency_rate(100, "USD", "EUR")
+        >>> await get_currency_rate(client, 100, "USD", "EUR")
         # Returns current exchange rate * 100
     """
     from_currency = from_currency.upper()
     to_currency = to_currency.upper()
     
-    # Check cache first
-    cache_key = f"{from_currency}_{to_currency}"
-    if cache_key in _CURRENCY_CACHE:
-        return round(value * _CURRENCY_CACHE[cache_key], 2)
+    # Check cache first: one fetch serves every target currency for a base
+    rates = _RATES_CACHE.get(from_currency)
+    if rates is None:
+        rates = await _fetch_rates(client, from_currency)
+        _RATES_CACHE[from_currency] = rates
+    
+    if to_currency not in rates:
+        raise ValueError(
+            f"Currency conversion failed: "
+            f"Currency '{to_currency}' not found in exchange rates"
+        )
+    
+    return round(value * rates[to_currency], 2)
+
+
+async def refresh_currency_rates(
+    client: httpx.AsyncClient,
+    base_currency: str
+) -> None:
+    """
+    Fetch the rates table for a base currency and store it in the cache
+    
+    Used by the background refresher so user requests hit a warm cache.
     
+    Raises:
+        Exception: If the API call fails or the response is malformed
+    """
+    base_currency = base_currency.upper()
+    _RATES_CACHE[base_currency] = await _fetch_rates(client, base_currency)
+
+
+def save_rates_cache(path: str) -> int:
+    """
+    Write the cached rates tables to a JSON file
+    
+    Each base is written with its fetch time so a later load keeps its
+    remaining lifetime. The write goes through a temporary file so a crash
+    never leaves a truncated cache behind.
+    
+    Returns:
+        Number of base currencies written
+    
+    Raises:
+        OSError: If the file cannot be written
+    """
+    _RATES_CACHE.expire()
+    now = time.time()
+    payload = {
+        "rates": {
+            base: {
+                "fetched_at": getattr(rates, "fetched_at", now),
+                "rates": dict(rates),
+            }
+            for base, rates in _RATES_CACHE.items()
+        }
+    }
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp = tempfile.NamedTemporaryFile(
+        "w", dir=directory, suffix=".tmp", delete=False
+    )
+    try:
+        with tmp:
+            json.dump(payload, tmp)
+        os.replace(tmp.name, path)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+    return len(payload["rates"])
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _parse_rates_cache(payload) -> Dict[str, _RatesTable]:
+    """Validate a decoded rates cache file, raising ValueError if malformed"""
+    if not isinstance(payload, dict) or not isinstance(payload.get("rates"), dict):
+        raise ValueError("Invalid rates cache file: expected a 'rates' object")
+    
+    tables = {}
+    for base, entry in payload["rates"].items():
+        if not isinstance(entry, dict) or not _is_number(entry.get("fetched_at")):
+            raise ValueError(f"Invalid rates cache file: bad entry for {base!r}")
+        rates = entry.get("rates")
+        if not isinstance(rates, dict) or not all(
+            isinstance(code, str) and _is_number(rate)
+            for code, rate in rates.items()
+        ):
+            raise ValueError(f"Invalid rates cache file: bad rates for {base!r}")
+        tables[base] = _RatesTable(rates, float(entry["fetched_at"]))
+    return tables
+
+
+def load_rates_cache(path: str) -> int:
+    """
+    Seed the rates cache from a file written by save_rates_cache
+    
+    Entries keep their original fetch time, so they expire a TTL after they
+    were fetched, not after they were loaded; entries already past it are
+    skipped. The file is validated in full before anything is loaded.
+    
+    Returns:
+        Number of base currencies loaded (0 if the file is missing or stale)
+    
+    Raises:
+        OSError: If the file exists but cannot be read
+        ValueError: If the file is not a valid rates cache
+    """
     try:
-        # Call external API
-        url = f"{settings.CURRENCY_API_URL}/{from_currency}"
-        response = requests.get(url, timeout=settings.CURRENCY_API_TIMEOUT)
+        with open(path) as f:
+            payload = json.load(f)
+    except FileNotFoundError:
+        return 0
+    
+    now = time.time()
+    loaded = 0
+    for base, rates in _parse_rates_cache(payload).items():
+        if _rates_expiry(base, rates, now) > now:
+            _RATES_CACHE[base] = rates
+            loaded += 1
+    return loaded
+
+
+async def _fetch_rates(
+    client: httpx.AsyncClient,
+    base_currency: str
+) -> Dict[str, float]:
+    """
+    Fetch the full exchange rates table for a base currency
+    
+    Raises:
+        Exception: If the API call fails or the response is malformed
+    """
+    try:
+        # Call external API (relative to the client's base URL)
+        response = await client.get(base_currency)
         response.raise_for_status()
         
         data = response.json()
@@ -223,22 +534,13 @@ def get_currency_rate(
         if "rates" not in data:
             raise Exception("Invalid API response format")
         
-        if to_currency not in data["rates"]:
-            raise ValueError(
-                f"Currency '{to_currency}' not found in exchange rates"
-            )
-        
-        # Get and cache the rate
-        rate = data["rates"][to_currency]
-        _CURRENCY_CACHE[cache_key] = rate
-        
-        return round(value * rate, 2)
+        return _RatesTable(data["rates"], time.time())
     
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         raise Exception(
             f"Currency API timeout after {settings.CURRENCY_API_TIMEOUT}s"
         )
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         raise Exception(f"Currency API request failed: {str(e)}")
     except Exception as e:
-        raise Exception(f"Currency conversion failed: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Currency conversion failed: {str(e)}")
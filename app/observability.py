@@ -1,43 +1,66 @@
 """
-Observability setup: Metrics (Prometheus), Logs (Loguru), Tracing (OpenTelemetry)
+Observability setup: Metrics (Prometheus), Logs (logging), Tracing (OpenTelemetry)
 """
 import os
 import sys
-import json
-from fastapi import FastAPI, Response
+import gzip
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+import orjson
+from fastapi import FastAPI, Request, Response
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-from loguru import logger
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import ConsoleSpanExporter, BatchSpanProcessor, SpanExporter
+from opentelemetry.sdk.trace.export import ConsoleSpanExporter, BatchSpanProcessor
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
+from app.config import settings
+
+# Read once at import; the test suite sets TESTING=1 before importing the app
+_TESTING = os.environ.get("TESTING") == "1"
+
 # ====================================================================
-# LOGS CONFIGURATION (Loguru)
+# LOGS CONFIGURATION (logging)
 # ====================================================================
 
-def setup_logging():
-    """Configure structured JSON logging with Loguru"""
-    logger.remove()  # Remove default handler
+logger = logging.getLogger("unit_converter")
+
+# Attributes present on every LogRecord; anything else came from extra=
+_RECORD_ATTRS = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None))
+) | {"message", "asctime"}
+
 
-    def json_formatter(record):
+class JsonFormatter(logging.Formatter):
+    """Render each log record as a single-line JSON object"""
+
+    def format(self, record: logging.LogRecord) -> str:
         log_entry = {
-            "timestamp": record["time"].strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-            "level": record["level"].name,
-            "message": record["message"],
-            "module": record["module"],
-            "function": record["function"],
-            "line": record["line"],
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc)
+                                 .strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
         }
-        if record["extra"]:
-            log_entry.update(record["extra"])
-        return json.dumps(log_entry)
-
-    logger.add(
-        sys.stdout,
-        level="INFO",
-        serialize=True  # Keep JSON formatting
-    )
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                log_entry[key] = value
+        if record.exc_info:
+            log_entry["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(log_entry, default=str).decode()
+
+
+def setup_logging():
+    """Configure structured JSON logging on stdout"""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    logger.handlers[:] = [handler]  # Idempotent if called again
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    logger.propagate = False
     logger.info("Structured logging initialized")
 
 
@@ -68,46 +91,135 @@ CONVERSION_COUNT = Counter(
 def setup_metrics(app: FastAPI):
     """Add /metrics endpoint for Prometheus"""
     @app.get("/metrics", include_in_schema=False)
-    async def metrics():
+    async def metrics(request: Request):
+        # Apply buffered updates so the scrape sees every finished request,
+        # then serialize in a worker thread so it doesn't block the event loop
+        flush_metrics()
+        body = await asyncio.to_thread(generate_latest)
+        headers = {"Vary": "Accept-Encoding"}
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            body = gzip.compress(body, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
         return Response(
-            content=generate_latest(),
-            media_type=CONTENT_TYPE_LATEST
+            content=body,
+            media_type=CONTENT_TYPE_LATEST,
+            headers=headers
         )
     logger.info("Prometheus metrics endpoint configured at /metrics")
 
 
-def track_request(endpoint: str, duration: float, status: str):
-    """Track request metrics"""
-    REQUEST_COUNT.labels(endpoint=endpoint, status=status).inc()
-    REQUEST_DURATION.labels(endpoint=endpoint).observe(duration)
-    if status == "success":
-        CONVERSION_COUNT.labels(conversion_type=endpoint).inc()
+# Label children are bound once for the fixed set of endpoints and statuses,
+# so a flush does a single dict lookup per label set and no .labels() call;
+# an unexpected label is bound on first use and cached alongside them
+ENDPOINTS = (
+    "length", "weight", "temperature", "currency",
+    "length_batch", "weight_batch", "temperature_batch",
+)
+STATUSES = ("success", "error")
+
+# A bucket this full is flushed inline, so the buffer stays bounded even
+# when the periodic flusher is not running
+METRICS_MAX_PENDING = 1024
+
+
+def _bind_children(endpoint: str, status: str) -> tuple:
+    """Return the (request counter, duration histogram, conversion counter) children"""
+    return (
+        REQUEST_COUNT.labels(endpoint, status),
+        REQUEST_DURATION.labels(endpoint),
+        CONVERSION_COUNT.labels(endpoint) if status == "success" else None,
+    )
+
+
+_CHILDREN = {
+    (ep, st): _bind_children(ep, st)
+    for ep in ENDPOINTS for st in STATUSES
+}
+
+# Durations (ns) of finished requests not yet applied, per (endpoint, status).
+# Requests append here instead of taking a metric lock each; the buffer is
+# swapped out whole on flush. No lock is needed: the app only touches it from
+# the event loop thread (tests disable the periodic flusher so they can too).
+_pending: dict = defaultdict(list)
+
+
+def track_request(endpoint: str, duration_ns: int, status: str):
+    """Track request metrics (duration in integer nanoseconds)"""
+    durations = _pending[(endpoint, status)]
+    durations.append(duration_ns)
+    if len(durations) >= METRICS_MAX_PENDING:
+        flush_metrics()
+
+
+def flush_metrics():
+    """Apply buffered request metrics to the Prometheus children"""
+    global _pending
+    if not _pending:
+        return
+    pending, _pending = _pending, defaultdict(list)
+    for key, durations in pending.items():
+        children = _CHILDREN.get(key)
+        if children is None:
+            children = _CHILDREN[key] = _bind_children(*key)
+        requests, histogram, conversions = children
+        requests.inc(len(durations))
+        for duration_ns in durations:
+            histogram.observe(duration_ns * 1e-9)
+        if conversions is not None:
+            conversions.inc(len(durations))
+
+
+async def run_metrics_flusher():
+    """Flush buffered request metrics every settings.METRICS_FLUSH_SECONDS"""
+    try:
+        while True:
+            await asyncio.sleep(settings.METRICS_FLUSH_SECONDS)
+            flush_metrics()
+    finally:
+        # Don't lose the last interval on shutdown
+        flush_metrics()
 
 
 # ====================================================================
 # TRACING CONFIGURATION (OpenTelemetry)
 # ====================================================================
 
-class DummyExporter(SpanExporter):
-    """Exporter that discards spans (for testing)"""
-    def export(self, spans):
-        return trace.SpanExportResult.SUCCESS
-    def shutdown(self):
-        pass
-
 def setup_tracing(app: FastAPI):
-    """Configure OpenTelemetry tracing"""
-    tracer_provider = TracerProvider()
-    trace.set_tracer_provider(tracer_provider)
+    """Configure OpenTelemetry tracing (exporter chosen by OTEL_EXPORTER)"""
+    # No spans, processor thread or request instrumentation during tests
+    if _TESTING:
+        trace.set_tracer_provider(trace.NoOpTracerProvider())
+        return
 
-    # Use dummy exporter during tests to avoid stdout closed errors
-    if os.environ.get("TESTING") == "1":
-        exporter = DummyExporter()
-    else:
+    # Fall back to the standard SDK variable for the collector address
+    endpoint = settings.OTEL_ENDPOINT or os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "")
+    exporter_name = settings.OTEL_EXPORTER or ("otlp" if endpoint else "none")
+
+    if exporter_name == "otlp":
+        # Imported lazily so grpc is only loaded when OTLP export is enabled
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter(
+            endpoint=endpoint or None, insecure=settings.OTEL_INSECURE or None
+        )
+    elif exporter_name == "console" and settings.ENVIRONMENT == "development":
+        # Prints every batch under stdout's lock, so never used in production
         exporter = ConsoleSpanExporter()
+    else:
+        if exporter_name == "console":
+            logger.warning("Console span exporter is only available in development")
+        logger.info("OpenTelemetry tracing disabled")
+        return
 
-    span_processor = BatchSpanProcessor(exporter)
+    span_processor = BatchSpanProcessor(
+        exporter,
+        max_queue_size=settings.OTEL_BSP_MAX_QUEUE_SIZE,
+        schedule_delay_millis=settings.OTEL_BSP_SCHEDULE_DELAY,
+        max_export_batch_size=settings.OTEL_BSP_MAX_EXPORT_BATCH_SIZE,
+        export_timeout_millis=settings.OTEL_BSP_EXPORT_TIMEOUT
+    )
+    tracer_provider = TracerProvider()
     tracer_provider.add_span_processor(span_processor)
+    trace.set_tracer_provider(tracer_provider)
 
     # Instrument FastAPI
     FastAPIInstrumentor.instrument_app(app)
@@ -124,18 +236,25 @@ def get_tracer(name: str):
 # HELPER FUNCTION
 # ====================================================================
 
+# Display names for log messages, built once instead of per record
+DISPLAY_NAMES = {conversion_type: conversion_type.capitalize() for conversion_type in ENDPOINTS}
+
+
 def log_conversion(conversion_type: str, from_val: float, to_val: float,
-                   from_unit: str, to_unit: str, duration: float):
-    """Log a conversion with structured data"""
-    logger.info(
-        f"{conversion_type.capitalize()} conversion completed",
+                   from_unit: str, to_unit: str, duration_ns: int):
+    """Log a conversion with structured data (DEBUG level)"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    logger.debug(
+        "%s conversion completed",
+        DISPLAY_NAMES[conversion_type],
         extra={
             "conversion_type": conversion_type,
             "from_value": from_val,
             "to_value": to_val,
             "from_unit": from_unit,
             "to_unit": to_unit,
-            "duration_seconds": round(duration, 4)
+            "duration_seconds": duration_ns * 1e-9
         }
     )
 
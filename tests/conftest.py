@@ -0,0 +1,77 @@
+"""
+Shared pytest fixtures
+"""
+import os
+
+# Must be set before the app is imported: skips tracing, disables the
+# background rates refresher, the periodic metrics flush and the on-disk
+# rates cache
+os.environ["TESTING"] = "1"
+os.environ["CURRENCY_REFRESH_SECONDS"] = "0"
+os.environ["METRICS_FLUSH_SECONDS"] = "0"
+os.environ["CURRENCY_CACHE_FILE"] = ""
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+
+from app.config import settings
+
+# Rates returned by the mocked currency API for every base currency
+MOCK_RATES = {"USD": 1.0, "EUR": 0.9, "GBP": 0.8, "TND": 3.1}
+
+
+@pytest.fixture(scope="session")
+def currency_transport():
+    """Stand-in for the currency API so no test touches the network"""
+    def handler(request):
+        return httpx.Response(200, json={"rates": MOCK_RATES})
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.fixture
+def rates_cache(monkeypatch):
+    """Fresh, empty rates cache swapped in for the module-level one"""
+    from app import converters
+    cache = converters._make_rates_cache(16)
+    monkeypatch.setattr(converters, "_RATES_CACHE", cache)
+    return cache
+
+
+@pytest_asyncio.fixture
+async def currency_client(rates_cache, currency_transport):
+    """
+    Factory for clients on a mocked currency API, with an empty rates cache
+    
+    Called with no handler the client serves MOCK_RATES; otherwise requests
+    go to the given httpx.MockTransport handler. Clients are closed on
+    teardown.
+    """
+    clients = []
+
+    def make(handler=None):
+        transport = currency_transport if handler is None else httpx.MockTransport(handler)
+        clients.append(httpx.AsyncClient(
+            base_url=settings.CURRENCY_API_URL, transport=transport
+        ))
+        return clients[-1]
+
+    yield make
+    for currency_client in clients:
+        await currency_client.aclose()
+
+
+@pytest.fixture(scope="session")
+def client(currency_transport):
+    """Test client with the application lifespan running for the session"""
+    from app.main import app, get_currency_client
+    currency_client = httpx.AsyncClient(
+        base_url=settings.CURRENCY_API_URL, transport=currency_transport
+    )
+    app.dependency_overrides[get_currency_client] = lambda: currency_client
+    with TestClient(app) as test_client:
+        yield test_client
+        test_client.portal.call(currency_client.aclose)
+    app.dependency_overrides.clear()
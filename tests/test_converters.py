@@ -1,12 +1,27 @@
 """
 Unit tests for conversion functions
 """
+import json
+import time
+import httpx
 import pytest
+from app import converters
+from app.config import settings
 from app.converters import (
+    NUMPY_MIN_BATCH,
+    LENGTH_FACTORS,
+    WEIGHT_FACTORS,
+    TEMPERATURE_UNITS,
     convert_length,
     convert_weight,
     convert_temperature,
-    get_currency_rate
+    convert_length_batch,
+    convert_weight_batch,
+    convert_temperature_batch,
+    get_currency_rate,
+    refresh_currency_rates,
+    load_rates_cache,
+    save_rates_cache
 )
 
 
@@ -17,40 +32,18 @@ from app.converters import (
 class TestLengthConversion:
     """Test cases for length conversion"""
     
-    def test_meter_to_kilometer(self):
-        """Test converting meters to kilometers"""
-        result = convert_length(1000, "meter", "kilometer")
-        assert result == 1.0
-    
-    def test_kilometer_to_meter(self):
-        """Test converting kilometers to meters"""
-        result = convert_length(1, "kilometer", "meter")
-        assert result == 1000.0
-    
-    def test_foot_to_meter(self):
-        """Test converting feet to meters"""
-        result = convert_length(1, "foot", "meter")
-        assert 0.3047 < result < 0.3049
-    
-    def test_meter_to_foot(self):
-        """Test converting meters to feet"""
-        result = convert_length(1, "meter", "foot")
-        assert 3.28 < result < 3.29
-    
-    def test_inch_to_centimeter(self):
-        """Test converting inches to centimeters"""
-        result = convert_length(1, "inch", "centimeter")
-        assert 2.53 < result < 2.55
-    
-    def test_mile_to_kilometer(self):
-        """Test converting miles to kilometers"""
-        result = convert_length(1, "mile", "kilometer")
-        assert 1.609 < result < 1.610
-    
-    def test_same_unit(self):
-        """Test conversion with same source and target unit"""
-        result = convert_length(100, "meter", "meter")
-        assert result == 100.0
+    @pytest.mark.parametrize("value,from_unit,to_unit,expected", [
+        (1000, "meter", "kilometer", 1.0),
+        (1, "kilometer", "meter", 1000.0),
+        (1, "foot", "meter", 0.3048),
+        (1, "meter", "foot", 3.28084),
+        (1, "inch", "centimeter", 2.54),
+        (1, "mile", "kilometer", 1.60934),
+        (100, "meter", "meter", 100.0),
+    ])
+    def test_conversion(self, value, from_unit, to_unit, expected):
+        """Test converting between length units"""
+        assert convert_length(value, from_unit, to_unit) == pytest.approx(expected)
     
     def test_invalid_source_unit(self):
         """Test error handling for invalid source unit"""
@@ -78,40 +71,18 @@ class TestLengthConversion:
 class TestWeightConversion:
     """Test cases for weight conversion"""
     
-    def test_kilogram_to_gram(self):
-        """Test converting kilograms to grams"""
-        result = convert_weight(1, "kilogram", "gram")
-        assert result == 1000.0
-    
-    def test_gram_to_kilogram(self):
-        """Test converting grams to kilograms"""
-        result = convert_weight(1000, "gram", "kilogram")
-        assert result == 1.0
-    
-    def test_pound_to_kilogram(self):
-        """Test converting pounds to kilograms"""
-        result = convert_weight(1, "pound", "kilogram")
-        assert 0.453 < result < 0.454
-    
-    def test_kilogram_to_pound(self):
-        """Test converting kilograms to pounds"""
-        result = convert_weight(1, "kilogram", "pound")
-        assert 2.204 < result < 2.205
-    
-    def test_ounce_to_gram(self):
-        """Test converting ounces to grams"""
-        result = convert_weight(1, "ounce", "gram")
-        assert 28.34 < result < 28.36
-    
-    def test_ton_to_kilogram(self):
-        """Test converting tons to kilograms"""
-        result = convert_weight(1, "ton", "kilogram")
-        assert result == 1000.0
-    
-    def test_same_unit(self):
-        """Test conversion with same source and target unit"""
-        result = convert_weight(50, "kilogram", "kilogram")
-        assert result == 50.0
+    @pytest.mark.parametrize("value,from_unit,to_unit,expected", [
+        (1, "kilogram", "gram", 1000.0),
+        (1000, "gram", "kilogram", 1.0),
+        (1, "pound", "kilogram", 0.453592),
+        (1, "kilogram", "pound", 2.204624),
+        (1, "ounce", "gram", 28.3495),
+        (1, "ton", "kilogram", 1000.0),
+        (50, "kilogram", "kilogram", 50.0),
+    ])
+    def test_conversion(self, value, from_unit, to_unit, expected):
+        """Test converting between weight units"""
+        assert convert_weight(value, from_unit, to_unit) == pytest.approx(expected)
     
     def test_invalid_source_unit(self):
         """Test error handling for invalid source unit"""
@@ -208,6 +179,106 @@ class TestTemperatureConversion:
         assert result1 == result2
 
 
+# ============================================================================
+# BATCH CONVERSION TESTS
+# ============================================================================
+
+class TestBatchConversion:
+    """Test cases for vectorized batch conversion"""
+    
+    def test_length_batch_matches_scalar(self):
+        """Test that batch length results match scalar conversions"""
+        values = [0, 1, 2.5, 1000, 123456.789]
+        result = convert_length_batch(values, "meter", "foot")
+        assert result == pytest.approx(
+            [convert_length(v, "meter", "foot") for v in values]
+        )
+    
+    def test_weight_batch(self):
+        """Test converting a batch of weights"""
+        result = convert_weight_batch([1, 2, 0.5], "kilogram", "gram")
+        assert result == [1000.0, 2000.0, 500.0]
+    
+    def test_temperature_batch(self):
+        """Test converting a batch of temperatures"""
+        result = convert_temperature_batch([0, 100, -40], "celsius", "fahrenheit")
+        assert result == [32.0, 212.0, -40.0]
+    
+    def test_batch_returns_floats(self):
+        """Test that batch results are plain Python floats"""
+        result = convert_length_batch([1000], "meter", "kilometer")
+        assert result == [1.0]
+        assert type(result[0]) is float
+    
+    def test_empty_batch(self):
+        """Test converting an empty batch"""
+        assert convert_weight_batch([], "kilogram", "gram") == []
+    
+    def test_batch_case_insensitive(self):
+        """Test that batch unit names are case insensitive"""
+        result = convert_length_batch([1], "METER", "Kilometer")
+        assert result == [0.001]
+    
+    def test_small_and_numpy_batches_agree(self):
+        """Test that batches either side of the NumPy threshold match scalar results"""
+        for size in (NUMPY_MIN_BATCH - 1, NUMPY_MIN_BATCH):
+            values = [i * 1.37 for i in range(size)]
+            result = convert_temperature_batch(values, "kelvin", "fahrenheit")
+            assert result == pytest.approx(
+                [convert_temperature(v, "kelvin", "fahrenheit") for v in values]
+            )
+            assert all(type(r) is float for r in result)
+
+    def test_rounding_independent_of_batch_size(self):
+        """Test that a half-way value rounds the same on both sides of the NumPy threshold"""
+        expected = convert_temperature(473.775, "celsius", "fahrenheit")
+        for size in (NUMPY_MIN_BATCH - 1, NUMPY_MIN_BATCH):
+            result = convert_temperature_batch([473.775] * size, "celsius", "fahrenheit")
+            assert result == [expected] * size
+
+    def test_numpy_rounding_matches_scalar_on_half_way_values(self):
+        """Test that NumPy-path rounding equals round() on many half-way values"""
+        values = [i / 1000 + 0.005 for i in range(-20_000, 20_000, 7)]
+        assert convert_temperature_batch(values, "celsius", "kelvin") == [
+            convert_temperature(v, "celsius", "kelvin") for v in values
+        ]
+        values = [i * 1e-7 + 5e-7 for i in range(-20_000, 20_000, 7)]
+        assert convert_length_batch(values, "meter", "centimeter") == [
+            convert_length(v, "meter", "centimeter") for v in values
+        ]
+
+    def test_numpy_rounding_keeps_non_finite_and_huge_values(self):
+        """Test that values NumPy cannot scale exactly still round like round()"""
+        values = [float("inf"), float("-inf"), 1e308, -1e300, 5e15 + 0.5] * 3
+        assert convert_length_batch(values, "meter", "meter") == [
+            round(v, 6) for v in values
+        ]
+
+    def test_large_batch_matches_scalar(self):
+        """Test that a large batch matches the scalar converter"""
+        values = [float(i) for i in range(10_005)]
+        result = convert_temperature_batch(values, "celsius", "fahrenheit")
+        assert len(result) == len(values)
+        assert result[:3] == [32.0, 33.8, 35.6]
+        assert result[-1] == convert_temperature(values[-1], "celsius", "fahrenheit")
+
+    def test_numpy_matches_scalar_on_rounding_boundaries(self):
+        """Test that the NumPy path rounds half-way values exactly like the scalar converter"""
+        for value, from_unit, to_unit in (
+            (-15.075, "celsius", "fahrenheit"),
+            (-99.265, "fahrenheit", "celsius"),
+            (473.775, "celsius", "fahrenheit"),
+        ):
+            result = convert_temperature_batch([value] * NUMPY_MIN_BATCH, from_unit, to_unit)
+            assert result == [convert_temperature(value, from_unit, to_unit)] * NUMPY_MIN_BATCH
+    
+    def test_batch_invalid_unit(self):
+        """Test error handling for invalid batch units"""
+        with pytest.raises(ValueError) as excinfo:
+            convert_temperature_batch([0], "celsius", "invalid_unit")
+        assert "Invalid target unit" in str(excinfo.value)
+
+
 # ============================================================================
 # CURRENCY CONVERSION TESTS
 # ============================================================================
@@ -215,41 +286,171 @@ class TestTemperatureConversion:
 class TestCurrencyConversion:
     """Test cases for currency conversion"""
     
-    def test_currency_conversion_returns_float(self):
+    @pytest.mark.asyncio
+    async def test_currency_conversion_returns_float(self, currency_client):
         """Test that currency conversion returns a float"""
-        # This test requires internet connection
-        try:
-            result = get_currency_rate(100, "USD", "EUR")
-            assert isinstance(result, float)
-            assert result > 0
-        except Exception:
-            pytest.skip("Currency API not available")
-    
-    def test_currency_same_currency(self):
+        result = await get_currency_rate(currency_client(), 100, "USD", "EUR")
+        assert isinstance(result, float)
+        assert result == 90.0
+    
+    @pytest.mark.asyncio
+    async def test_currency_same_currency(self, currency_client, rates_cache):
         """Test converting same currency (should use cache)"""
-        try:
-            # First call to populate cache
-            result1 = get_currency_rate(100, "USD", "EUR")
-            # Second call should use cache
-            result2 = get_currency_rate(100, "USD", "EUR")
-            assert result1 == result2
-        except Exception:
-            pytest.skip("Currency API not available")
-    
-    def test_currency_invalid_currency(self):
+        client = currency_client()
+        # First call to populate cache
+        result1 = await get_currency_rate(client, 100, "USD", "EUR")
+        # Second call should use cache
+        result2 = await get_currency_rate(client, 100, "USD", "EUR")
+        assert result1 == result2
+        assert "USD" in rates_cache
+    
+    @pytest.mark.asyncio
+    async def test_currency_invalid_currency(self, currency_client):
         """Test error handling for invalid currency code"""
-        with pytest.raises(Exception):
-            get_currency_rate(100, "USD", "INVALID")
+        with pytest.raises(ValueError, match="'INVALID' not found"):
+            await get_currency_rate(currency_client(), 100, "USD", "INVALID")
     
-    def test_currency_case_insensitive(self):
+    @pytest.mark.asyncio
+    async def test_currency_case_insensitive(self, currency_client):
         """Test that currency codes are case insensitive"""
-        try:
-            result1 = get_currency_rate(100, "usd", "eur")
-            result2 = get_currency_rate(100, "USD", "EUR")
-            # Results should be equal (both use cache)
-            assert result1 == result2
-        except Exception:
-            pytest.skip("Currency API not available")
+        client = currency_client()
+        result1 = await get_currency_rate(client, 100, "usd", "eur")
+        result2 = await get_currency_rate(client, 100, "USD", "EUR")
+        # Results should be equal (both use cache)
+        assert result1 == result2
+    
+    @pytest.mark.asyncio
+    async def test_currency_cache_expires(self, currency_client, monkeypatch):
+        """Test that cached rates are refetched once the TTL has elapsed"""
+        now = [time.time()]
+        monkeypatch.setattr(
+            converters, "_RATES_CACHE",
+            converters._make_rates_cache(16, timer=lambda: now[0])
+        )
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.path)
+            return httpx.Response(200, json={"rates": {"EUR": 0.5}})
+
+        client = currency_client(handler)
+        assert await get_currency_rate(client, 100, "USD", "EUR") == 50.0
+        assert await get_currency_rate(client, 100, "USD", "EUR") == 50.0
+        assert len(calls) == 1
+        now[0] += settings.CURRENCY_CACHE_TTL_SECONDS + 1
+        assert await get_currency_rate(client, 100, "USD", "EUR") == 50.0
+        assert len(calls) == 2
+    
+    @pytest.mark.asyncio
+    async def test_currency_rates_cached_per_base(self, currency_client):
+        """Test that one fetch serves every target currency of a base"""
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.path)
+            return httpx.Response(
+                200, json={"rates": {"EUR": 0.5, "GBP": 0.25, "JPY": 150.0}}
+            )
+
+        client = currency_client(handler)
+        assert await get_currency_rate(client, 100, "USD", "EUR") == 50.0
+        assert await get_currency_rate(client, 100, "USD", "GBP") == 25.0
+        assert await get_currency_rate(client, 2, "USD", "JPY") == 300.0
+        with pytest.raises(ValueError):
+            await get_currency_rate(client, 100, "USD", "INVALID")
+        assert calls == ["/v4/latest/USD"]
+    
+    @pytest.mark.asyncio
+    async def test_currency_cache_evicts_least_recently_used(
+        self, currency_client, monkeypatch
+    ):
+        """Test that a full cache drops the least recently used base"""
+        monkeypatch.setattr(
+            converters, "_RATES_CACHE", converters._make_rates_cache(2)
+        )
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.path.rsplit("/", 1)[-1])
+            return httpx.Response(200, json={"rates": {"XXX": 1.0}})
+
+        client = currency_client(handler)
+        for base in ("USD", "EUR", "USD", "GBP", "USD", "EUR"):
+            await get_currency_rate(client, 1, base, "XXX")
+        assert calls == ["USD", "EUR", "GBP", "EUR"]
+    
+    @pytest.mark.asyncio
+    async def test_refresh_warms_cache(self, currency_client):
+        """Test that a background refresh serves later lookups from cache"""
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.path)
+            return httpx.Response(200, json={"rates": {"USD": 1.25}})
+
+        client = currency_client(handler)
+        await refresh_currency_rates(client, "eur")
+        assert await get_currency_rate(client, 100, "EUR", "USD") == 125.0
+        assert calls == ["/v4/latest/EUR"]
+
+    def test_rates_cache_persists_to_disk(self, rates_cache, tmp_path):
+        """Test that a saved rates cache is reloaded into an empty cache"""
+        path = str(tmp_path / "cache" / "rates.json")
+        rates_cache["USD"] = {"EUR": 0.5}
+        assert save_rates_cache(path) == 1
+
+        rates_cache.clear()
+        assert load_rates_cache(path) == 1
+        assert rates_cache["USD"] == {"EUR": 0.5}
+        assert [p.name for p in (tmp_path / "cache").iterdir()] == ["rates.json"]
+
+    def test_stale_rates_cache_entries_skipped(self, rates_cache, tmp_path):
+        """Test that only entries still within the TTL are loaded"""
+        ttl = settings.CURRENCY_CACHE_TTL_SECONDS
+        path = tmp_path / "rates.json"
+        path.write_text(json.dumps({"rates": {
+            "USD": {"fetched_at": time.time() - ttl - 1, "rates": {"EUR": 0.5}},
+            "EUR": {"fetched_at": time.time(), "rates": {"USD": 2.0}},
+        }}))
+        assert load_rates_cache(str(path)) == 1
+        assert "USD" not in rates_cache
+        assert rates_cache["EUR"] == {"USD": 2.0}
+
+    def test_loaded_rates_keep_remaining_ttl(self, monkeypatch, tmp_path):
+        """Test that a reloaded entry expires a TTL after its original fetch"""
+        now = [time.time()]
+        path = tmp_path / "rates.json"
+        path.write_text(json.dumps({"rates": {"USD": {
+            "fetched_at": now[0] - settings.CURRENCY_CACHE_TTL_SECONDS + 5,
+            "rates": {"EUR": 0.5},
+        }}}))
+        monkeypatch.setattr(
+            converters, "_RATES_CACHE",
+            converters._make_rates_cache(16, timer=lambda: now[0])
+        )
+        assert load_rates_cache(str(path)) == 1
+        assert "USD" in converters._RATES_CACHE
+        now[0] += 10
+        assert "USD" not in converters._RATES_CACHE
+
+    @pytest.mark.parametrize("payload", [
+        [],
+        {"rates": []},
+        {"rates": {"USD": "garbage"}},
+        {"rates": {"USD": {"fetched_at": "yesterday", "rates": {}}}},
+        {"rates": {"USD": {"fetched_at": 0, "rates": {"EUR": "0.5"}}}},
+    ])
+    def test_malformed_rates_cache_file(self, rates_cache, tmp_path, payload):
+        """Test that a malformed cache file raises ValueError and loads nothing"""
+        path = tmp_path / "rates.json"
+        path.write_text(json.dumps(payload))
+        with pytest.raises(ValueError, match="Invalid rates cache file"):
+            load_rates_cache(str(path))
+        assert len(rates_cache) == 0
+
+    def test_missing_rates_cache_file(self, tmp_path):
+        """Test that a missing cache file loads nothing"""
+        assert load_rates_cache(str(tmp_path / "missing.json")) == 0
 
 
 # ============================================================================
@@ -285,6 +486,33 @@ class TestEdgeCases:
         # Should be rounded to 6 decimal places
         assert len(str(result).split('.')[-1]) <= 6
 
+    def test_direct_factors_match_base_units(self):
+        """Test the pairwise factor tables agree with going via the base unit"""
+        for factors, convert in (
+            (LENGTH_FACTORS, convert_length),
+            (WEIGHT_FACTORS, convert_weight),
+        ):
+            for a, fa in factors.items():
+                for b, fb in factors.items():
+                    assert convert(123.456, a, b) == round(123.456 * fa / fb, 6)
+
+    def test_temperature_affine_matches_formulas(self):
+        """Test every temperature pair agrees with the via-Celsius formulas"""
+        to_celsius = {
+            "celsius": lambda v: v,
+            "fahrenheit": lambda v: (v - 32) * 5 / 9,
+            "kelvin": lambda v: v - 273.15,
+        }
+        from_celsius = {
+            "celsius": lambda c: c,
+            "fahrenheit": lambda c: c * 9 / 5 + 32,
+            "kelvin": lambda c: c + 273.15,
+        }
+        for a in TEMPERATURE_UNITS:
+            for b in TEMPERATURE_UNITS:
+                expected = round(from_celsius[b](to_celsius[a](-40.5)), 2)
+                assert convert_temperature(-40.5, a, b) == pytest.approx(expected, abs=0.01)
+
 
 # ============================================================================
 # INTEGRATION TESTS
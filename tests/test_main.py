@@ -2,11 +2,20 @@
 Integration tests for FastAPI endpoints
 """
 import pytest
-from fastapi.testclient import TestClient
-from app.main import app
+from typing import get_args
+from prometheus_client import REGISTRY
+from app import observability
+from app.config import settings
+from app.converters import LENGTH_FACTORS, WEIGHT_FACTORS, TEMPERATURE_UNITS
+from app.main import BATCH_THREAD_MIN, LengthUnit, WeightUnit, TemperatureUnit
+from app.observability import flush_metrics, track_request
 
-# Create test client
-client = TestClient(app)
+
+def _volume_errors() -> float:
+    """Current value of the failed volume request counter"""
+    return REGISTRY.get_sample_value(
+        "api_requests_total", {"endpoint": "volume", "status": "error"}
+    ) or 0.0
 
 
 # ============================================================================
@@ -16,7 +25,7 @@ client = TestClient(app)
 class TestGeneralEndpoints:
     """Test general API endpoints"""
     
-    def test_root_endpoint(self):
+    def test_root_endpoint(self, client):
         """Test root endpoint returns API information"""
         response = client.get("/")
         assert response.status_code == 200
@@ -28,7 +37,7 @@ class TestGeneralEndpoints:
         assert "health" in data
         assert "metrics" in data
     
-    def test_health_endpoint(self):
+    def test_health_endpoint(self, client):
         """Test health check endpoint"""
         response = client.get("/health")
         assert response.status_code == 200
@@ -38,13 +47,55 @@ class TestGeneralEndpoints:
         assert "timestamp" in data
         assert isinstance(data["timestamp"], float)
     
-    def test_metrics_endpoint(self):
+    def test_metrics_endpoint(self, client):
         """Test Prometheus metrics endpoint"""
         response = client.get("/metrics")
         assert response.status_code == 200
         assert "api_requests_total" in response.text
         assert "api_request_duration_seconds" in response.text
 
+    def test_metrics_gzip(self, client):
+        """Test metrics are gzip-compressed when the scraper accepts it"""
+        response = client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert "api_requests_total" in response.text
+
+    def test_metrics_identity(self, client):
+        """Test metrics are sent uncompressed otherwise"""
+        response = client.get("/metrics", headers={"Accept-Encoding": "identity"})
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+        assert "api_requests_total" in response.text
+
+    def test_metrics_unknown_endpoint_label(self, client):
+        """Test a label outside the pre-bound set is created on first use"""
+        track_request("area", 10_000_000, "success")
+        track_request("area", 10_000_000, "success")
+        response = client.get("/metrics")
+        assert 'api_requests_total{endpoint="area",status="success"} 2.0' in response.text
+        assert 'api_request_duration_seconds_sum{endpoint="area"} 0.02' in response.text
+
+    def test_metrics_buffered_until_flush(self):
+        """Test that request metrics are applied in bulk on flush"""
+        before = _volume_errors()
+        track_request("volume", 5_000_000, "error")
+        track_request("volume", 5_000_000, "error")
+        assert _volume_errors() == before
+        flush_metrics()
+        assert _volume_errors() == before + 2
+
+    def test_full_metrics_bucket_flushed_inline(self, monkeypatch):
+        """Test that a bucket reaching the cap is flushed without the flusher"""
+        monkeypatch.setattr(observability, "METRICS_MAX_PENDING", 3)
+        before = _volume_errors()
+        track_request("volume", 5_000_000, "error")
+        track_request("volume", 5_000_000, "error")
+        assert _volume_errors() == before
+        track_request("volume", 5_000_000, "error")
+        assert _volume_errors() == before + 3
+        assert not observability._pending
+
 
 # ============================================================================
 # LENGTH CONVERSION ENDPOINT TESTS
@@ -53,7 +104,7 @@ class TestGeneralEndpoints:
 class TestLengthConversionEndpoint:
     """Test length conversion endpoint"""
     
-    def test_length_conversion_success(self):
+    def test_length_conversion_success(self, client):
         """Test successful length conversion"""
         response = client.post(
             "/convert/length",
@@ -70,7 +121,7 @@ class TestLengthConversionEndpoint:
         assert data["from_unit"] == "meter"
         assert data["to_unit"] == "kilometer"
     
-    def test_length_conversion_invalid_unit(self):
+    def test_length_conversion_invalid_unit(self, client):
         """Test length conversion with invalid unit"""
         response = client.post(
             "/convert/length",
@@ -80,10 +131,52 @@ class TestLengthConversionEndpoint:
                 "to_unit": "meter"
             }
         )
-        assert response.status_code == 400
-        assert "Invalid source unit" in response.json()["detail"]
+        assert response.status_code == 422  # Rejected by the unit Literal
+        assert response.json()["detail"][0]["loc"] == ["body", "from_unit"]
+    
+    def test_length_conversion_cache_control(self, client):
+        """Test that deterministic conversions are marked cacheable"""
+        response = client.post(
+            "/convert/length",
+            json={
+                "value": 1,
+                "from_unit": "meter",
+                "to_unit": "foot"
+            }
+        )
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "public, max-age=86400, immutable"
+    
+    def test_length_conversion_error_not_cached(self, client):
+        """Test that error responses carry no Cache-Control header"""
+        response = client.post(
+            "/convert/length",
+            json={
+                "value": 1,
+                "from_unit": "invalid",
+                "to_unit": "foot"
+            }
+        )
+        assert response.status_code == 422
+        assert "cache-control" not in response.headers
+    
+    def test_length_conversion_case_insensitive(self, client):
+        """Test that unit names are normalized to lowercase"""
+        response = client.post(
+            "/convert/length",
+            json={
+                "value": 1000,
+                "from_unit": "METER",
+                "to_unit": "Kilometer"
+            }
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["converted_value"] == 1.0
+        assert data["from_unit"] == "meter"
+        assert data["to_unit"] == "kilometer"
     
-    def test_length_conversion_missing_field(self):
+    def test_length_conversion_missing_field(self, client):
         """Test length conversion with missing field"""
         response = client.post(
             "/convert/length",
@@ -95,7 +188,7 @@ class TestLengthConversionEndpoint:
         )
         assert response.status_code == 422  # Validation error
     
-    def test_length_conversion_invalid_type(self):
+    def test_length_conversion_invalid_type(self, client):
         """Test length conversion with invalid value type"""
         response = client.post(
             "/convert/length",
@@ -108,6 +201,26 @@ class TestLengthConversionEndpoint:
         assert response.status_code == 422  # Validation error
 
 
+# ============================================================================
+# UNIT VALIDATION TESTS
+# ============================================================================
+
+class TestUnitLiterals:
+    """Test that request validation accepts exactly the supported units"""
+    
+    def test_length_units_match_converter(self):
+        """Test that the length unit Literal matches the converter table"""
+        assert set(get_args(LengthUnit)) == set(LENGTH_FACTORS)
+    
+    def test_weight_units_match_converter(self):
+        """Test that the weight unit Literal matches the converter table"""
+        assert set(get_args(WeightUnit)) == set(WEIGHT_FACTORS)
+    
+    def test_temperature_units_match_converter(self):
+        """Test that the temperature unit Literal matches the converter table"""
+        assert set(get_args(TemperatureUnit)) == set(TEMPERATURE_UNITS)
+
+
 # ============================================================================
 # WEIGHT CONVERSION ENDPOINT TESTS
 # ============================================================================
@@ -115,7 +228,7 @@ class TestLengthConversionEndpoint:
 class TestWeightConversionEndpoint:
     """Test weight conversion endpoint"""
     
-    def test_weight_conversion_success(self):
+    def test_weight_conversion_success(self, client):
         """Test successful weight conversion"""
         response = client.post(
             "/convert/weight",
@@ -132,7 +245,7 @@ class TestWeightConversionEndpoint:
         assert data["from_unit"] == "kilogram"
         assert data["to_unit"] == "gram"
     
-    def test_weight_conversion_invalid_unit(self):
+    def test_weight_conversion_invalid_unit(self, client):
         """Test weight conversion with invalid unit"""
         response = client.post(
             "/convert/weight",
@@ -142,8 +255,8 @@ class TestWeightConversionEndpoint:
                 "to_unit": "invalid"
             }
         )
-        assert response.status_code == 400
-        assert "Invalid target unit" in response.json()["detail"]
+        assert response.status_code == 422  # Rejected by the unit Literal
+        assert response.json()["detail"][0]["loc"] == ["body", "to_unit"]
 
 
 # ============================================================================
@@ -153,7 +266,7 @@ class TestWeightConversionEndpoint:
 class TestTemperatureConversionEndpoint:
     """Test temperature conversion endpoint"""
     
-    def test_temperature_conversion_success(self):
+    def test_temperature_conversion_success(self, client):
         """Test successful temperature conversion"""
         response = client.post(
             "/convert/temperature",
@@ -170,7 +283,7 @@ class TestTemperatureConversionEndpoint:
         assert data["from_unit"] == "celsius"
         assert data["to_unit"] == "fahrenheit"
     
-    def test_temperature_conversion_invalid_unit(self):
+    def test_temperature_conversion_invalid_unit(self, client):
         """Test temperature conversion with invalid unit"""
         response = client.post(
             "/convert/temperature",
@@ -180,8 +293,8 @@ class TestTemperatureConversionEndpoint:
                 "to_unit": "invalid"
             }
         )
-        assert response.status_code == 400
-        assert "Invalid target unit" in response.json()["detail"]
+        assert response.status_code == 422  # Rejected by the unit Literal
+        assert response.json()["detail"][0]["loc"] == ["body", "to_unit"]
 
 
 # ============================================================================
@@ -191,8 +304,8 @@ class TestTemperatureConversionEndpoint:
 class TestCurrencyConversionEndpoint:
     """Test currency conversion endpoint"""
     
-    def test_currency_conversion_success(self):
-        """Test successful currency conversion (requires internet)"""
+    def test_currency_conversion_success(self, client):
+        """Test successful currency conversion (mocked currency API)"""
         response = client.post(
             "/convert/currency",
             json={
@@ -201,18 +314,14 @@ class TestCurrencyConversionEndpoint:
                 "to_unit": "EUR"
             }
         )
-        # May fail if no internet, check both possibilities
-        if response.status_code == 200:
-            data = response.json()
-            assert data["original_value"] == 100
-            assert data["converted_value"] > 0
-            assert data["from_unit"] == "USD"
-            assert data["to_unit"] == "EUR"
-        else:
-            # API call failed (no internet or API down)
-            assert response.status_code == 500
-    
-    def test_currency_conversion_invalid_currency(self):
+        assert response.status_code == 200
+        data = response.json()
+        assert data["original_value"] == 100
+        assert data["converted_value"] == 90.0
+        assert data["from_unit"] == "USD"
+        assert data["to_unit"] == "EUR"
+    
+    def test_currency_conversion_invalid_currency(self, client):
         """Test currency conversion with invalid currency"""
         response = client.post(
             "/convert/currency",
@@ -226,6 +335,106 @@ class TestCurrencyConversionEndpoint:
         assert "conversion failed" in response.json()["detail"].lower()
 
 
+# ============================================================================
+# BATCH CONVERSION ENDPOINT TESTS
+# ============================================================================
+
+class TestBatchConversionEndpoint:
+    """Test batch conversion endpoints"""
+    
+    def test_length_batch_success(self, client):
+        """Test successful batch length conversion"""
+        response = client.post(
+            "/convert/length/batch",
+            json={
+                "values": [1000, 2500],
+                "from_unit": "meter",
+                "to_unit": "kilometer"
+            }
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["converted_values"] == [1.0, 2.5]
+        assert data["from_unit"] == "meter"
+        assert data["to_unit"] == "kilometer"
+    
+    def test_weight_batch_success(self, client):
+        """Test successful batch weight conversion"""
+        response = client.post(
+            "/convert/weight/batch",
+            json={
+                "values": [1, 2],
+                "from_unit": "kilogram",
+                "to_unit": "gram"
+            }
+        )
+        assert response.status_code == 200
+        assert response.json()["converted_values"] == [1000.0, 2000.0]
+    
+    def test_temperature_batch_success(self, client):
+        """Test successful batch temperature conversion"""
+        response = client.post(
+            "/convert/temperature/batch",
+            json={
+                "values": [0, 100],
+                "from_unit": "celsius",
+                "to_unit": "fahrenheit"
+            }
+        )
+        assert response.status_code == 200
+        assert response.json()["converted_values"] == [32.0, 212.0]
+    
+    def test_batch_invalid_unit(self, client):
+        """Test batch conversion with invalid unit"""
+        response = client.post(
+            "/convert/length/batch",
+            json={
+                "values": [1],
+                "from_unit": "invalid",
+                "to_unit": "meter"
+            }
+        )
+        assert response.status_code == 422  # Rejected by the unit Literal
+        assert response.json()["detail"][0]["loc"] == ["body", "from_unit"]
+    
+    def test_batch_invalid_values(self, client):
+        """Test batch conversion with non-numeric values"""
+        response = client.post(
+            "/convert/length/batch",
+            json={
+                "values": [1, "invalid"],
+                "from_unit": "meter",
+                "to_unit": "foot"
+            }
+        )
+        assert response.status_code == 422  # Validation error
+    
+    def test_batch_too_large(self, client):
+        """Test that batches above BATCH_MAX_SIZE are rejected"""
+        response = client.post(
+            "/convert/length/batch",
+            json={
+                "values": [1.0] * (settings.BATCH_MAX_SIZE + 1),
+                "from_unit": "meter",
+                "to_unit": "foot"
+            }
+        )
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "values"]
+
+    def test_large_batch_converted_in_thread(self, client):
+        """Test that a batch large enough for a worker thread converts correctly"""
+        values = [float(i) for i in range(BATCH_THREAD_MIN)]
+        response = client.post(
+            "/convert/temperature/batch",
+            json={"values": values, "from_unit": "celsius", "to_unit": "fahrenheit"}
+        )
+        assert response.status_code == 200
+        converted = response.json()["converted_values"]
+        assert len(converted) == BATCH_THREAD_MIN
+        assert converted[:2] == [32.0, 33.8]
+
+
 # ============================================================================
 # CORS TESTS
 # ============================================================================
@@ -233,7 +442,7 @@ class TestCurrencyConversionEndpoint:
 class TestCORS:
     """Test CORS headers"""
     
-    def test_cors_headers_present(self):
+    def test_cors_headers_present(self, client):
         """Test that CORS headers are present"""
         response = client.options(
             "/convert/length",
@@ -250,12 +459,12 @@ class TestCORS:
 class TestErrorHandling:
     """Test error handling"""
     
-    def test_404_not_found(self):
+    def test_404_not_found(self, client):
         """Test 404 for non-existent endpoint"""
         response = client.get("/nonexistent")
         assert response.status_code == 404
     
-    def test_405_method_not_allowed(self):
+    def test_405_method_not_allowed(self, client):
         """Test 405 for wrong HTTP method"""
         response = client.get("/convert/length")  # Should be POST
         assert response.status_code == 405
@@ -268,7 +477,7 @@ class TestErrorHandling:
 class TestDocumentation:
     """Test API documentation endpoints"""
     
-    def test_openapi_schema(self):
+    def test_openapi_schema(self, client):
         """Test OpenAPI schema is accessible"""
         response = client.get("/openapi.json")
         assert response.status_code == 200
@@ -277,13 +486,21 @@ class TestDocumentation:
         assert "info" in schema
         assert schema["info"]["title"] == "Unit Converter API"
     
-    def test_swagger_ui(self):
+    def test_openapi_documents_response_models(self, client):
+        """Test that conversion response schemas are still documented"""
+        schema = client.get("/openapi.json").json()
+        assert "ConversionResponse" in schema["components"]["schemas"]
+        assert "BatchConversionResponse" in schema["components"]["schemas"]
+        length_200 = schema["paths"]["/convert/length"]["post"]["responses"]["200"]
+        assert length_200["content"]["application/json"]["schema"]["$ref"].endswith("/ConversionResponse")
+    
+    def test_swagger_ui(self, client):
         """Test Swagger UI is accessible"""
         response = client.get("/docs")
         assert response.status_code == 200
         assert "swagger" in response.text.lower()
     
-    def test_redoc(self):
+    def test_redoc(self, client):
         """Test ReDoc is accessible"""
         response = client.get("/redoc")
         assert response.status_code == 200